@@ -0,0 +1,319 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) 2024 DK Lab, LLC. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+"""
+This is an asyncio Python client of Registry Service, leveraging its HTTP API and aiohttp.
+It mirrors `registry_client.RegistryClient`, with the methods being coroutines, so that many
+operations can be in flight at the same time.
+Please refer to the HTTP API specification for detail.
+"""
+
+import asyncio
+import time
+
+import aiohttp
+
+from registry_client import (
+    DeleteDataResult, DescribeOrgResult, ListItemsResult, ListStats, OrgStats, ReadDataResult,
+    ReadRoleResult, RegistryClient, RegistryError, ReleaseRoleResult, RotateOrgKeyResult,
+    TakeRoleResult, WriteDataResult)
+from registry_client import _CONTENT_TYPE, _X_DK_CREATE_ORG_TIME, _X_DK_ORG_TIME, _X_DK_UPDATE_ORG_TIME
+from registry_client import _data_url, _directory_url, _extract_json, _json_dumps, _raise_error, _role_url
+
+class _Response:
+    """The parts of an aiohttp response that the client uses, read before the response is released."""
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+class AsyncRegistryClient:
+    """
+    An asyncio client for interacting with the Registry Service.
+
+    Args:
+        instance (str): The name of the Registry Service instance, e.g., "useast2", or "beta.useast2".
+        org_name (str): The org this client works with.
+        org_key (str): The authorization credential for the org.
+        limit (int, optional): The maximum number of connections in total.  Default is 100.
+        limit_per_host (int, optional): The maximum number of connections to the service.  Default is 32.
+
+    Attributes:
+        service_url (str): This URL is formed from the instance name.
+        org_name (str): This stores `org_name` arg.
+        org_key (str): This stores `org_key` arg.
+
+    The connections are opened when entering the `async with` statement, and closed when exiting it.
+
+    Example:
+        async with AsyncRegistryClient("useast2", "my_org", "my_org_key") as client:
+            results = await asyncio.gather(
+                client.write_data("/dir/a", "A", "text/plain"),
+                client.write_data("/dir/b", "B", "text/plain"))
+    """
+    def __init__(self, instance, org_name, org_key, limit=100, limit_per_host=32):
+        self.service_url = f"https://{instance}.registry.dkplatform.io/svc/"
+        self.org_name = org_name
+        self.org_key = org_key
+        # The URLs are built by concatenating onto these.
+        self._org_url = f"{self.service_url}/{self.org_name}"
+        self._url_prefix = self._org_url + "/"
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self._limit, limit_per_host=self._limit_per_host, keepalive_timeout=300, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(connector=connector)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        Close the connections to the service.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    GenericErrorMessages = RegistryClient.GenericErrorMessages
+
+    """Header names."""
+    CONTENT_TYPE = RegistryClient.CONTENT_TYPE
+    X_DK_ORG_TIME = RegistryClient.X_DK_ORG_TIME
+    X_DK_CREATE_ORG_TIME = RegistryClient.X_DK_CREATE_ORG_TIME
+    X_DK_UPDATE_ORG_TIME = RegistryClient.X_DK_UPDATE_ORG_TIME
+
+    async def _request(self, method, url, headers=None, **kwargs):
+        """
+        Send a request, and read the whole response.
+
+        Returns:
+            _Response
+        """
+        all_headers = {"Authorization": self.org_key}
+        if headers:
+            all_headers.update(headers)
+        async with self._session.request(method, url, headers=all_headers, **kwargs) as response:
+            content = await response.read()
+            return _Response(response.status, response.headers, content)
+
+    async def take_role(self, role_path, player_name, playtime_secs=None, max_players=None):
+        """
+        Refer to `RegistryClient.take_role`.
+        """
+        url = _role_url(self._url_prefix, role_path)
+        client_unix_time_in_msecs = int(time.time() * 1000)  # Current local epoch time in milliseconds
+
+        data = {
+            "player_name": player_name,
+            "client_unix_time_in_msecs": client_unix_time_in_msecs
+        }
+        if playtime_secs is not None:
+            data["playtime_secs"] = playtime_secs
+        if max_players is not None:
+            data["max_players"] = max_players
+
+        response = await self._request("PUT", url, json=data)
+
+        if response.status_code == 200 or response.status_code == 201:
+            h = response.headers
+            json = _extract_json(response)
+            return TakeRoleResult(
+                int(h[_X_DK_ORG_TIME]),
+                response.status_code == 201,
+                json.get("client_expiration_time_in_msecs"))
+        else:
+            _raise_error(response)
+
+    async def release_role(self, role_path, player_name):
+        """
+        Refer to `RegistryClient.release_role`.
+        """
+        url = _role_url(self._url_prefix, role_path)
+        data = {
+            "player_name": player_name
+        }
+
+        response = await self._request("DELETE", url, json=data)
+
+        if response.status_code == 200:
+            h = response.headers
+            return ReleaseRoleResult(int(h[_X_DK_ORG_TIME]))
+        else:
+            _raise_error(response)
+
+    async def read_role(self, role_path):
+        """
+        Refer to `RegistryClient.read_role`.
+        """
+        url = _role_url(self._url_prefix, role_path)
+        response = await self._request("GET", url)
+
+        if response.status_code == 200:
+            h = response.headers
+            json = _extract_json(response)
+            return ReadRoleResult(
+                int(h[_X_DK_ORG_TIME]),
+                json.get("default_playtime_secs"),
+                json.get("max_players"),
+                json.get("players_remaining_milliseconds"))
+        else:
+            _raise_error(response)
+
+    async def write_data(self, data_item_path, data, content_type="application/json", update_org_time=None):
+        """
+        Refer to `RegistryClient.write_data`.
+        """
+        url = _data_url(self._url_prefix, data_item_path)
+        headers = {
+            "Content-Type": content_type,
+        }
+
+        if update_org_time is not None:
+            headers["x-dk-update-org-time"] = str(update_org_time)
+
+        # The body is sent as bytes, the same as `RegistryClient.write_data` does.
+        if isinstance(data, str):
+            data = data.encode()
+        elif isinstance(data, (dict, list)) and content_type == "application/json":
+            data = _json_dumps(data)
+
+        response = await self._request("PUT", url, headers=headers, data=data)
+
+        if response.status_code == 200 or response.status_code == 201:
+            h = response.headers
+            json = _extract_json(response)
+            return WriteDataResult(
+                int(h[_X_DK_ORG_TIME]),
+                response.status_code == 201,
+                json.get("create_org_time"),
+                json.get("update_org_time"),
+                json.get("number_of_bytes_written"))
+        else:
+            _raise_error(response)
+
+    async def write_data_many(self, items, concurrency=16):
+        """
+        Write many data items concurrently, with at most `concurrency` writes in flight at a time.
+
+        Args:
+            items (list): The `(data_item_path, data, content_type)` tuples of the writes, each
+                passed to `write_data` as its args.
+            concurrency (int, optional): The most writes in flight at a time.  Default is 16.
+
+        Returns:
+            list: The result of each write, in the same order as `items`, which is either a
+                WriteDataResult, or the RegistryError or other exception that the write raised.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def write_one(item):
+            async with semaphore:
+                return await self.write_data(*item)
+
+        return await asyncio.gather(*[write_one(item) for item in items], return_exceptions=True)
+
+    async def delete_data(self, data_item_path, update_org_time=None):
+        """
+        Refer to `RegistryClient.delete_data`.
+        """
+        url = _data_url(self._url_prefix, data_item_path)
+        headers = {}
+
+        if update_org_time is not None:
+            headers["x-dk-update-org-time"] = str(update_org_time)
+
+        response = await self._request("DELETE", url, headers=headers)
+
+        if response.status_code == 200:
+            h = response.headers
+            return DeleteDataResult(int(h[_X_DK_ORG_TIME]))
+        else:
+            _raise_error(response)
+
+    async def read_data(self, data_item_path):
+        """
+        Refer to `RegistryClient.read_data`.
+        """
+        url = _data_url(self._url_prefix, data_item_path)
+        response = await self._request("GET", url)
+
+        if response.status_code == 200:
+            h = response.headers
+            return ReadDataResult(
+                int(h[_X_DK_ORG_TIME]),
+                int(h[_X_DK_CREATE_ORG_TIME]),
+                int(h[_X_DK_UPDATE_ORG_TIME]),
+                h[_CONTENT_TYPE],
+                response.content)
+        else:
+            _raise_error(response)
+
+    async def list_items(self, directory_path):
+        """
+        Refer to `RegistryClient.list_items`.
+        """
+        url = _directory_url(self._url_prefix, directory_path)
+        response = await self._request("GET", url)
+
+        if response.status_code == 200:
+            h = response.headers
+            json = _extract_json(response)
+            stats = json.get("stats")
+            return ListItemsResult(
+                int(h[_X_DK_ORG_TIME]),
+                json.get("files"),
+                ListStats(
+                    int(stats.get("role_count")),
+                    int(stats.get("data_item_count"))))
+        else:
+            _raise_error(response)
+
+    async def rotate_org_key(self, new_org_key=None):
+        """
+        Refer to `RegistryClient.rotate_org_key`.
+        """
+        url = self._org_url
+        data = {}
+        if new_org_key is not None:
+            data["org_key"] = new_org_key
+
+        response = await self._request("PUT", url, json=data)
+
+        if response.status_code == 200:
+            h = response.headers
+            json = _extract_json(response)
+            self.org_key = json.get("org_key")
+            return RotateOrgKeyResult(
+                int(h[_X_DK_ORG_TIME]),
+                self.org_key)
+        else:
+            _raise_error(response)
+
+    async def describe_org(self):
+        """
+        Refer to `RegistryClient.describe_org`.
+        """
+        url = self._org_url
+        response = await self._request("GET", url)
+
+        if response.status_code == 200:
+            h = response.headers
+            json = _extract_json(response)
+            stats = json.get("stats")
+            return DescribeOrgResult(
+                json.get("org_name"),
+                json.get("org_key"),
+                int(h[_X_DK_ORG_TIME]),
+                json.get("is_deleted") == True,
+                OrgStats(
+                    stats.get("total_role_count"),
+                    stats.get("total_data_item_count"),
+                    stats.get("total_data_size")))
+        else:
+            _raise_error(response)
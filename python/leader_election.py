@@ -3,11 +3,116 @@
 #   Licensed under the MIT License. See LICENSE in project root for information.
 #   ---------------------------------------------------------------------------------
 
+import heapq
+import itertools
+import os
+import random
 import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 from registry_client import RegistryClient, RegistryError
 
+class _RenewalScheduler:
+    """
+    Renews the roles of all `Role` instances in the process, so that there is a single timer thread
+    regardless of the number of roles.  Each scheduled renewal is an entry in a min-heap keyed by its
+    deadline.  The timer thread waits until the earliest deadline, pops all the entries that are due,
+    and submits the renewals to a small thread pool, so that a slow request does not delay the others.
+
+    The heap holds weak references to the roles, so a `Role` that is no longer used stops being
+    renewed, and its playtime expires.  The threads only exist while there are roles to renew.
+    """
+    # The number of renewals in flight at once, shared by all the roles.  The pool only creates a
+    # thread when there are more concurrent renewals than idle threads.
+    MAX_WORKERS = int(os.getenv("ROLE_RENEW_WORKERS", "16"))
+    # Renewals due within this window are popped in the same tick, so that renewals of roles taken
+    # at about the same time go out together instead of waking the timer thread for each of them.
+    COALESCE_SECS = 0.020
+    # The timer thread and the pool exit after being idle for this many seconds.
+    IDLE_SECS = 5
+
+    def __init__(self):
+        self._seq = itertools.count()
+        self._reset()
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._thread = None
+        self._executor = None
+
+    def schedule(self, role, delay_secs):
+        """
+        Schedule `role` to be renewed in `delay_secs` seconds.
+
+        Returns:
+            int: The token of the renewal.  The renewal is skipped when popped if the role no longer
+                carries this token, which is how `Role.release()` cancels it.
+
+        Raises:
+            ValueError: If `delay_secs` is negative.
+        """
+        if delay_secs < 0:
+            raise ValueError(f"delay_secs must be non-negative, got {delay_secs}")
+        token = next(self._seq)
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay_secs, token, weakref.ref(role)))
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+        return token
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                while not self._heap or self._heap[0][0] > now:
+                    if not self._heap:
+                        # Retire the threads when there is nothing to renew for a while.  The next
+                        # schedule() starts them again.
+                        if not self._cond.wait(self.IDLE_SECS) and not self._heap:
+                            self._thread = None
+                            self._executor.shutdown(wait=False)
+                            return
+                    else:
+                        self._cond.wait(self._heap[0][0] - now)
+                    now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now + self.COALESCE_SECS:
+                    due.append(heapq.heappop(self._heap))
+            for (deadline, token, role_ref) in due:
+                role = role_ref()
+                if role is not None and role._renewal_token == token:
+                    self._executor.submit(role._renew, token)
+
+_scheduler = _RenewalScheduler()
+
+# All the live roles, so that they can be fixed up in a forked child.
+_roles = weakref.WeakSet()
+
+def _reset_after_fork():
+    """
+    A forked child inherits the roles, but not the scheduler's threads, and the locks may have been
+    held by threads that don't exist in the child.  Replace the locks, and resume renewing the roles
+    that were being maintained, or they would silently expire.
+    """
+    _scheduler._reset()
+    for role in list(_roles):
+        role._lock = threading.Lock()
+        role._renewal_token = None
+        role._renewal_in_flight = None
+        if role._to_maintain_role:
+            delay_secs = max(0.0, role.remaining_playtime() - role.RETRY_MARGIN_SECS)
+            role._renewal_token = _scheduler.schedule(role, delay_secs)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 class Role:
     """
     `Role` is a tool for leader election in a distributed system.  Leader election happens among
@@ -28,12 +133,14 @@ class Role:
 
     Attributes:
         name (str): This stores `name` arg.
-        client (RegistryClient): This client talks to the Registry Service instance.
+        client (RegistryClient): This client talks to the Registry Service instance.  The clients
+            of the roles share the connections in the process.
         role_path (str): This stores `role_path` arg.
         max_players (int): This stores `max_players` arg.
         playtime_secs (int): This stores `playtime_secs` arg.
         expiration_time_msecs (int): The timestamp when the playtime expires in milliseconds.
-            It is initially set to 0.
+            It is initially set to 0.  It is derived from the expiration kept internally per the
+            monotonic clock, which is what `is_holding()` checks against.
 
     Example:
         # Create a Role instance
@@ -55,41 +162,68 @@ class Role:
         else:
             print("No longer be the writer.")
     """
+    # A process may hold many roles, so use slots instead of a per-instance dict.
+    __slots__ = (
+        'name', 'client', 'role_path', 'max_players', 'playtime_secs',
+        '_expiration_ns', '_lock', '_to_maintain_role', '_renewal_token',
+        '_renewal_in_flight', '_take_role', '_random', '_releases', '__weakref__')
+
     def __init__(self, name, service_instance, org_name, org_key, role_path, max_players, playtime_secs=10):
         self.name = name
         self.client = RegistryClient(service_instance, org_name, org_key)
         self.role_path = role_path
         self.max_players = max_players
         self.playtime_secs = playtime_secs
-        self.expiration_time_msecs = 0
-        self._lock = threading.RLock()
+        self._expiration_ns = 0
+        # The lock is never acquired while already held: the critical sections do not call back
+        # into methods that take it, and the requests happen outside of them.
+        self._lock = threading.Lock()
         self._to_maintain_role = False
-        self._maintenance_thread = None
+        self._renewal_token = None
+        self._renewal_in_flight = None
+        self._take_role = None
+        # Counts the calls of release(), so that a take() can tell whether one overlapped it.
+        self._releases = 0
+        # For jittering the renewals.  Seeded by the player and the role, so that the schedule is
+        # reproducible for a given role, yet differs among the roles.
+        self._random = random.Random(f"{name}:{role_path}")
+        _roles.add(self)
 
     def take(self):
         """
-        Assume the role.  Thread safe.
+        Assume the role.  Thread safe.  On success, the role is renewed in the background until it
+        is released, or until the renewals fail to keep it before the playtime ends, after which
+        `is_holding()` is False until the role is taken again.
 
         Returns:
             bool: True on success, False otherwise.  Note that in rare cases the client has become
                 a player, but the server or network fails, leading to a False outcome.  The client
                 could read the role to confirm, or retry, or just let the requested playtime expire.
+                It is False as well when release() is called while the role is being taken.
         """
         with self._lock:
-            try:
-                resp = self.client.take_role(
-                    self.role_path, self.name, self.playtime_secs, self.max_players)
-                if resp.client_expiration_time_in_msecs > self.expiration_time_msecs:
-                    self.expiration_time_msecs = resp.client_expiration_time_in_msecs
-                self._to_maintain_role = True
-                # Maintain the role
-                if self._maintenance_thread is None:
-                    self._maintenance_thread = threading.Thread(target=self._maintain_role)
-                    self._maintenance_thread.daemon = True
-                    self._maintenance_thread.start()
-                return True
-            except RegistryError as e:
+            params = (self.role_path, self.name, self.playtime_secs, self.max_players)
+            releases = self._releases
+        # The renewals repeat this request, so prepare it once.
+        take_role = self.client.prepare_take_role(*params)
+        # The network round trip happens without holding the lock, so that is_holding(), release(),
+        # and the renewals are not blocked behind it.
+        try:
+            resp = take_role()
+        except RegistryError as e:
+            return False
+        with self._lock:
+            # A release() that started during the request wins, or the role would be renewed after
+            # having been released.
+            if self._releases != releases:
                 return False
+            self._extend_expiration(self._to_monotonic_ns(resp.client_expiration_time_in_msecs))
+            self._take_role = take_role
+            self._to_maintain_role = True
+            # Maintain the role
+            if self._renewal_token is None:
+                self._renewal_token = _scheduler.schedule(self, self._retake_interval(first=True))
+        return True
 
     def release(self):
         """
@@ -101,16 +235,29 @@ class Role:
                 could read the role to confirm, or retry, or just let the requested playtime expire.
         """
         with self._lock:
+            self._releases += 1
             self._to_maintain_role = False
-            if self._maintenance_thread:
-                # Don't wait for the maintenance thread to finish, because 
-                # the thread is waiting to take the lock.
-                self._maintenance_thread = None
+            # Cancel the scheduled renewal.  It costs no request if it hasn't started.
+            self._renewal_token = None
+            renewal_in_flight = self._renewal_in_flight
+        if renewal_in_flight is not None:
+            # Let the renewal land before releasing, or the server might see the release first and
+            # the role would be held until the playtime expires.
+            renewal_in_flight.wait()
+        # Retry a few times, but well within the playtime, after which the role is released anyway.
+        for backoff_secs in self.RELEASE_BACKOFF_SECS + (None,):
             try:
                 self.client.release_role(self.role_path, self.name)
                 return True
+            except RegistryError as e:
+                # Client errors, such as not being a player, won't go away by retrying.
+                if e.http_code < 500:
+                    return False
             except Exception:
-                num_attempts -= 1
+                pass
+            if backoff_secs is not None:
+                time.sleep(backoff_secs)
+        return False
 
     def is_holding(self, num_secs=0.0):
         """
@@ -124,9 +271,11 @@ class Role:
         Returns:
             bool: True if the client is holding the role, False otherwise.
         """
-        target_time_msecs = int((time.time() + num_secs) * 1000)
-        with self._lock:
-            return target_time_msecs < self.expiration_time_msecs
+        # No lock is needed to read a single attribute.  The common case of checking the present
+        # skips the float arithmetic.
+        if num_secs:
+            return time.monotonic_ns() + int(num_secs * 1e9) < self._expiration_ns
+        return time.monotonic_ns() < self._expiration_ns
 
     def active_players(self):
         """
@@ -137,8 +286,25 @@ class Role:
             a set of names of players whose playtime is unexpired, or None if there is an error.
         """
         try:
-            resp = self.client.read_role(self.role_path)
-            return {player_name for (player_name, remaining_playtime) in resp.players_remaining_milliseconds.items() if remaining_playtime > 0}
+            return self.client.read_role(self.role_path).active_players()
+        except RegistryError as e:
+            return None
+
+    def active_players_cached(self, ttl_secs=0.25):
+        """
+        Get the list of active players like `active_players()`, but reuse the role read by `client`
+        within the last `ttl_secs` seconds, if any.  The client drops the read when the role is
+        taken, renewed, or released through it.
+
+        Args:
+            ttl_secs (float, optional): How long the role read is reused.  It should be well below
+                the playtime, or the players may have expired.  Default is 0.25 seconds.
+
+        Returns:
+            a set of names of players whose playtime is unexpired, or None if there is an error.
+        """
+        try:
+            return self.client.read_role(self.role_path, cache_ttl_secs=ttl_secs).active_players()
         except RegistryError as e:
             return None
 
@@ -147,35 +313,94 @@ class Role:
         Returns:
             float: a number of remaining seconds.
         """
-        return float(self.expiration_time_msecs)/1000.0 - time.time()
-
-    def _maintain_role(self):
-        """
-        Internal method to periodically re-take the role.
-        """
-        # Allow to retry before the playtime ends.  For simplicity, retries are 1 second apart.
-        # And to incur fewest requests in the normal case, retries happen at the end of the playtime.
-        num_retries = 1
-
-        retake_interval = self.playtime_secs - 1 - num_retries
-        time.sleep(retake_interval)
-        while self._to_maintain_role:
-            with self._lock:
-                # Checking the flag `_to_maintain_role` again below to ensure that after release()
-                # is called, the maintenance thread will not attempt to take the role again, which
-                # otherwise could happen as follows:
-                # - Here the flag is check in the while condition above,
-                # - Then release() gets the lock and calls client.release_role().
-                # - Then here it gets the lock and (without checking the flag) calls client.take_role().
-                retry_remaining = num_retries
-                while self._to_maintain_role and retry_remaining > 0:
-                    try:
-                        resp = self.client.take_role(
-                            self.role_path, self.instance_name, self.playtime_secs, self.max_players)
-                        if resp.client_expiration_time_in_msecs > self.expiration_time_msecs:
-                            self.expiration_time_msecs = resp.client_expiration_time_in_msecs
-                        retry_remaining = 0
-                    except Exception:
-                        time.sleep(1)
-                        retry_remaining -= 1
-            time.sleep(retake_interval)
+        return (self._expiration_ns - time.monotonic_ns()) / 1e9
+
+    @property
+    def expiration_time_msecs(self):
+        if self._expiration_ns == 0:
+            return 0
+        return int(time.time() * 1000) + (self._expiration_ns - time.monotonic_ns()) // 1_000_000
+
+    def _extend_expiration(self, expiration_ns):
+        """
+        Move the expiration forward without taking the lock.  An attribute store is atomic, so the
+        loop only repeats when a concurrent store of an earlier expiration lands in between.  And
+        even if that happens after the last check, the earlier expiration only makes `is_holding()`
+        conservative until the next renewal.
+        """
+        while expiration_ns > self._expiration_ns:
+            self._expiration_ns = expiration_ns
+
+    @staticmethod
+    def _to_monotonic_ns(client_expiration_time_in_msecs):
+        """
+        Translate an expiration timestamp per the client's wall clock to the monotonic clock, so that
+        `is_holding()` is unaffected by later adjustments of the wall clock.  The translation is done
+        right after the response is received, and so the remaining playtime is never overestimated.
+        """
+        remaining_msecs = client_expiration_time_in_msecs - int(time.time() * 1000)
+        return time.monotonic_ns() + remaining_msecs * 1_000_000
+
+    # To incur fewest requests in the normal case, renewals happen at the end of the playtime, but
+    # early enough to allow for retries before the playtime ends.
+    RETRY_MARGIN_SECS = 2
+    # A failed renewal is retried by the scheduler after half of the remaining playtime, but at
+    # most this many seconds and at least `MIN_RETRY_DELAY_SECS`.
+    MAX_RETRY_DELAY_SECS = 1
+    MIN_RETRY_DELAY_SECS = 0.1
+    # The seconds to wait before each retry of release().
+    RELEASE_BACKOFF_SECS = (0.05, 0.2, 0.5)
+
+    def _retake_interval(self, first=False):
+        """
+        The roles taken at about the same time would otherwise be renewed at about the same time
+        forever, so the interval is shortened by a random amount to spread the renewals out.  The
+        first interval gets more jitter to break the synchronization sooner.  Never lengthening the
+        interval keeps the retries within the playtime.  A playtime too short for the margin is
+        renewed halfway through instead, and never sooner than `MIN_RETRY_DELAY_SECS`, so that a
+        short playtime doesn't turn the renewals into a busy loop.
+        """
+        jitter = self._random.uniform(0.85, 1.0) if first else self._random.uniform(0.9, 1.0)
+        if self.playtime_secs <= 2 * self.RETRY_MARGIN_SECS:
+            interval = self.playtime_secs / 2
+        else:
+            interval = self.playtime_secs - self.RETRY_MARGIN_SECS
+        return max(self.MIN_RETRY_DELAY_SECS, interval * jitter)
+
+    def _renew(self, token):
+        """
+        Internal method to re-take the role once and schedule the next renewal.  It runs in the
+        renewal scheduler's thread pool.
+
+        Args:
+            token (int):  The token of the renewal, which is no longer current if release() was called.
+        """
+        with self._lock:
+            if self._renewal_token != token:
+                return
+            take_role = self._take_role
+            # A release() from now on waits for this renewal, instead of racing it.
+            in_flight = self._renewal_in_flight = threading.Event()
+        try:
+            resp = take_role()
+        except Exception:
+            resp = None
+        if resp is not None:
+            self._extend_expiration(self._to_monotonic_ns(resp.client_expiration_time_in_msecs))
+        with self._lock:
+            self._renewal_in_flight = None
+            in_flight.set()
+            if self._renewal_token == token:
+                if resp is None:
+                    remaining_secs = self.remaining_playtime()
+                    if remaining_secs <= 0:
+                        # The role is lost.  Stop maintaining it, rather than taking it back in the
+                        # background, since the caller may have moved on.  The caller can take() it
+                        # again, which resumes the renewals.
+                        self._to_maintain_role = False
+                        self._renewal_token = None
+                        return
+                    delay_secs = max(self.MIN_RETRY_DELAY_SECS, min(self.MAX_RETRY_DELAY_SECS, remaining_secs / 2))
+                else:
+                    delay_secs = self._retake_interval()
+                self._renewal_token = _scheduler.schedule(self, delay_secs)
@@ -7,8 +7,48 @@ This is a Python client of Registry Service, leveraging its HTTP API.
 Please refer to the HTTP API specification for detail.
 """
 
+import contextlib
+import json
+import os
 import requests
+import sys
+import threading
 import time
+import weakref
+from types import TracebackType
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, NoReturn, Optional, Set, Tuple, Type
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote
+from urllib3.util.retry import Retry
+
+try:
+    # orjson decodes and encodes several times faster than the standard library, and is used when
+    # installed.  Both raise a ValueError on malformed input.
+    from orjson import dumps as _json_dumps, loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+# The names of the response headers that are read.  The header mappings look up the keys in
+# lowercase, so the names are lowercase, and interned for the string comparisons of the lookups.
+_CONTENT_TYPE = sys.intern("content-type")
+_X_DK_ORG_TIME = sys.intern("x-dk-org-time")
+_X_DK_CREATE_ORG_TIME = sys.intern("x-dk-create-org-time")
+_X_DK_UPDATE_ORG_TIME = sys.intern("x-dk-update-org-time")
+_RETRY_AFTER = sys.intern("retry-after")
+
+_GENERIC_ERROR_MESSAGES = {
+    400: "Bad request",
+    403: "Forbidden",
+    404: "Not found",
+    409: "Conflict",
+    413: "Payload too large",
+    500: "Internal server error",
+    503: "Request collision",
+    507: "Insufficient storage"
+}
 
 
 class TakeRoleResult:
@@ -24,7 +64,8 @@ class TakeRoleResult:
         is_new_role_created (bool): This stores `is_new_role_created` arg.
         client_expiration_time_in_msecs (int): This stores `client_expiration_time_in_msecs` arg.
     """
-    def __init__(self, org_time, is_new_role_created, client_expiration_time_in_msecs):
+    __slots__ = ("org_time", "is_new_role_created", "client_expiration_time_in_msecs")
+    def __init__(self, org_time: int, is_new_role_created: bool, client_expiration_time_in_msecs: int) -> None:
         self.org_time = org_time
         self.is_new_role_created = is_new_role_created
         self.client_expiration_time_in_msecs = client_expiration_time_in_msecs
@@ -46,7 +87,8 @@ class ReleaseRoleResult:
     Attributes:
         org_time (int): This stores `org_time` arg.
     """
-    def __init__(self, org_time):
+    __slots__ = ("org_time",)
+    def __init__(self, org_time: int) -> None:
         self.org_time = org_time
     def __repr__(self) -> str:
         return (
@@ -70,7 +112,10 @@ class ReadRoleResult:
         max_players (int): This stores `max_players` arg.
         players_remaining_milliseconds (dict): This stores `players_remaining_milliseconds` arg.
     """
-    def __init__(self, org_time, default_playtime_secs, max_players, players_remaining_milliseconds):
+    __slots__ = ("org_time", "default_playtime_secs", "max_players", "players_remaining_milliseconds")
+    def __init__(
+            self, org_time: int, default_playtime_secs: int, max_players: int,
+            players_remaining_milliseconds: Dict[str, int]) -> None:
         self.org_time = org_time
         self.default_playtime_secs = default_playtime_secs
         self.max_players = max_players
@@ -84,6 +129,15 @@ class ReadRoleResult:
             f"'player_remaining_milliseconds':{self.players_remaining_milliseconds}"
             "}"
         )
+    def active_players(self) -> Set[str]:
+        """
+        Returns:
+            set: The names of the players whose playtime is unexpired as of `org_time`.
+        """
+        # The response is decoded from a JSON object, so it is already a dict.  Splitting it into
+        # parallel lists of names and playtimes would cost an extra pass before filtering.
+        players = self.players_remaining_milliseconds or {}
+        return {name for (name, remaining_msecs) in players.items() if remaining_msecs > 0}
 
 class WriteDataResult:
     """Represents the result of a successful write-data operation in RegistryService.
@@ -102,7 +156,10 @@ class WriteDataResult:
         update_org_time (int): This stores `update_org_time` arg.
         number_of_bytes_written (int): This stores `number_of_bytes_written` arg.
     """
-    def __init__(self, org_time, is_new_data_item_created, create_org_time, update_org_time, number_of_bytes_written):
+    __slots__ = ("org_time", "is_new_data_item_created", "create_org_time", "update_org_time", "number_of_bytes_written")
+    def __init__(
+            self, org_time: int, is_new_data_item_created: bool, create_org_time: int, update_org_time: int,
+            number_of_bytes_written: int) -> None:
         self.org_time = org_time
         self.is_new_data_item_created = is_new_data_item_created
         self.create_org_time = create_org_time
@@ -128,7 +185,8 @@ class DeleteDataResult:
     Attributes:
         org_time (int): This stores `org_time` arg.
     """
-    def __init__(self, org_time):
+    __slots__ = ("org_time",)
+    def __init__(self, org_time: int) -> None:
         self.org_time = org_time
     def __repr__(self) -> str:
         return (
@@ -154,7 +212,10 @@ class ReadDataResult:
         content_type (str): This stores `content_type` arg.
         content (bytes): This stores `content` arg.
     """
-    def __init__(self, org_time, create_org_time, update_org_time, content_type, content):
+    __slots__ = ("org_time", "create_org_time", "update_org_time", "content_type", "content")
+    def __init__(
+            self, org_time: int, create_org_time: int, update_org_time: int, content_type: str,
+            content: Optional[bytes]) -> None:
         self.org_time = org_time
         self.create_org_time = create_org_time
         self.update_org_time = update_org_time
@@ -182,7 +243,8 @@ class ListStats:
         role_count (int): This stores `role_count` arg.
         data_item_count (int): This stores `data_item_count` arg.
     """
-    def __init__(self, role_count, data_item_count):
+    __slots__ = ("role_count", "data_item_count")
+    def __init__(self, role_count: int, data_item_count: int) -> None:
         self.role_count = role_count
         self.data_item_count = data_item_count
     def __repr__(self) -> str:
@@ -205,11 +267,25 @@ class ListItemsResult:
         org_time (int): This stores `org_time` arg.
         files (list of str): This stores `files` arg.
         stats (ListStats): This stores `stats` arg.
+        roles (list of str): The full paths of the roles in `files`, without the ".role" suffix.
+        data_items (list of str): The full paths of the data items in `files`, without the ".data"
+            suffix.
     """
-    def __init__(self, org_time, files, stats):
+    __slots__ = ("org_time", "files", "stats", "roles", "data_items")
+    def __init__(self, org_time: int, files: List[str], stats: "ListStats") -> None:
         self.org_time = org_time
         self.files = files
         self.stats = stats
+        # Split the files in one pass, so that the callers don't each filter them by suffix.
+        roles = []
+        data_items = []
+        for file in files or ():
+            if file.endswith(".role"):
+                roles.append(file[:-5])
+            elif file.endswith(".data"):
+                data_items.append(file[:-5])
+        self.roles = roles
+        self.data_items = data_items
     def __repr__(self) -> str:
         return (
             "ListItemsResult {"
@@ -230,7 +306,8 @@ class RotateOrgKeyResult:
         org_time (int): This stores `org_time` arg.
         org_key (str): This stores `org_key` arg.
     """
-    def __init__(self, org_time, org_key):
+    __slots__ = ("org_time", "org_key")
+    def __init__(self, org_time: int, org_key: str) -> None:
         self.org_time = org_time
         self.org_key = org_key
     def __repr__(self) -> str:
@@ -254,7 +331,8 @@ class OrgStats:
         total_data_item_count (int): This stores `total_data_item_count` arg.
         total_data_size (int): This stores `total_data_size` arg.
     """
-    def __init__(self, total_role_count, total_data_item_count, total_data_size):
+    __slots__ = ("total_role_count", "total_data_item_count", "total_data_size")
+    def __init__(self, total_role_count: int, total_data_item_count: int, total_data_size: int) -> None:
         self.total_role_count = total_role_count
         self.total_data_item_count = total_data_item_count
         self.total_data_size = total_data_size
@@ -284,7 +362,8 @@ class DescribeOrgResult:
         is_deleted (bool): This stores `is_deleted` arg.
         stats (OrgStats): This stores `stats` arg.
     """
-    def __init__(self, org_name, org_key, org_time, is_deleted, stats):
+    __slots__ = ("org_name", "org_key", "org_time", "is_deleted", "stats")
+    def __init__(self, org_name: str, org_key: str, org_time: int, is_deleted: bool, stats: "OrgStats") -> None:
         self.org_name = org_name
         self.org_key = org_key
         self.org_time = org_time
@@ -308,26 +387,135 @@ class RegistryError(Exception):
         http_code (int): HTTP status code in the response from RegistryService.
         message (str): The error message.
         extra_json (dict): The JSON providing extra information on the error. Refer to the HTTP API Document for the details.
+        retry_after (float, optional): The seconds to wait before retrying, from the "Retry-After"
+            header of the response.
  
     Attributes:
         http_code (int): This stores `http_code` arg.
         message (str): This stores `message` arg.
         extra_json (dict): This stores `extra_json` arg.
+        retry_after (float): This stores `retry_after` arg.  It is None if the service gave no hint.
     """
-    def __init__(self, http_code, message, extra_json=None):
+    def __init__(
+            self, http_code: int, message: str, extra_json: Optional[dict] = None,
+            retry_after: Optional[float] = None) -> None:
         super().__init__(message)
         self.http_code = http_code
         self.message = message
         self.extra_json = extra_json
+        self.retry_after = retry_after
     def __repr__(self) -> str:
         return (
             "RegistryError {"
             f"'http_code':{self.http_code},"
             f"'message':'{self.message}',"
-            f"'extra_json':{self.extra_json}"
+            f"'extra_json':{self.extra_json},"
+            f"'retry_after':{self.retry_after}"
             "}"
         )
 
+def _extract_json(response: Any) -> Optional[dict]:
+    """
+    Extract JSON data from the response if the response content is in JSON format.
+
+    Args:
+        response: The response, whose `headers` and `content` are read.
+
+    Returns:
+        dict or None: JSON data if the response is in JSON format, otherwise None.
+    """
+    if "application/json" in response.headers.get(_CONTENT_TYPE, ""):
+        try:
+            return _json_loads(response.content)
+        except ValueError:
+            return None
+
+def _raise_error(response: Any) -> NoReturn:
+    """
+    Raise the RegistryError that reports an unsuccessful response.
+
+    Raises:
+        RegistryError
+    """
+    http_code = response.status_code
+    retry_after = response.headers.get(_RETRY_AFTER)
+    if retry_after is not None:
+        try:
+            retry_after = float(retry_after)
+        except ValueError:
+            # An HTTP date, which the service does not send.
+            retry_after = None
+    raise RegistryError(
+        http_code,
+        _GENERIC_ERROR_MESSAGES.get(http_code, "Unknown error"),
+        _extract_json(response),
+        retry_after)
+
+# The characters left as they are in the paths.  Everything else is percent-encoded, "%"
+# included, so that a path is taken literally, e.g. "/50%off" or "/a%20b".
+_PATH_SAFE = "/"
+
+# The URLs of the items, which the clients build onto their `url_prefix` of the org.
+def _role_url(url_prefix: str, role_path: str) -> str:
+    return url_prefix + quote(role_path, safe=_PATH_SAFE) + ".role"
+
+def _data_url(url_prefix: str, data_item_path: str) -> str:
+    return url_prefix + quote(data_item_path, safe=_PATH_SAFE) + ".data"
+
+def _directory_url(url_prefix: str, directory_path: str) -> str:
+    return url_prefix + quote(directory_path, safe=_PATH_SAFE) + "/"
+
+def _new_session(http2: bool, pool_size: int, connection_retries: int) -> Any:
+    if http2:
+        import httpx
+        return httpx.Client(transport=httpx.HTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=pool_size),
+            retries=connection_retries))
+    session = requests.Session()
+    retry = Retry(
+        total=connection_retries,
+        backoff_factor=0.2,
+        status_forcelist=[503],
+        # Return the last 503 response, which is reported as a RegistryError.
+        raise_on_status=False)
+    # A session may be shared by the clients of several instances, with a pool for each.
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=retry))
+    return session
+
+_DEFAULT_POOL_SIZE = 64
+
+# The sessions shared by the clients that are given neither a session nor the pool settings, keyed
+# by whether they use HTTP/2.  They are created on first use.
+_default_sessions = {}
+_default_sessions_lock = threading.Lock()
+
+def _default_session(http2: bool) -> Any:
+    with _default_sessions_lock:
+        session = _default_sessions.get(http2)
+        if session is None:
+            session = _default_sessions[http2] = _new_session(http2, _DEFAULT_POOL_SIZE, 0)
+        return session
+
+# All the live clients, so that they can be fixed up in a forked child.
+_clients = weakref.WeakSet()
+
+def _reset_after_fork() -> None:
+    # The pooled connections are shared with the parent process after a fork.  Requests from both
+    # processes on the same connection would interleave, so the child starts with new connections.
+    # The sessions given by the callers are left to them.
+    global _default_sessions_lock
+    _default_sessions_lock = threading.Lock()
+    _default_sessions.clear()
+    for client in list(_clients):
+        if client._owns_session:
+            client._session = _new_session(client._http2, client._pool_size, client._connection_retries)
+        elif client._uses_default_session:
+            client._session = _default_session(client._http2)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 class RegistryClient:
     """
     A client for interacting with the Registry Service.
@@ -336,51 +524,159 @@ class RegistryClient:
         instance (str): The name of the Registry Service instance, e.g., "useast2", or "beta.useast2".
         org_name (str): The org this client works with.
         org_key (str): The authorization credential for the org.
+        pool_size (int, optional): The maximum number of connections kept alive to the service.
+            Default is 64.
+        connection_retries (int, optional): How many times a request is retried on connection errors
+            or "Request collision" (503) responses.  Default is 0.
+        http2 (bool, optional): Whether to use HTTP/2, which multiplexes concurrent requests over
+            one connection.  It requires the `httpx` package with the `http2` extra, and retries only
+            on connection errors.  Default is False, which uses `requests` and HTTP/1.1.
+        session (optional): The session to send the requests with, which is a `requests.Session`,
+            or an `httpx.Client` if `http2` is True.  `pool_size` and `connection_retries` don't
+            apply to it, and the client doesn't close it.
 
     Attributes:
         service_url (str): This URL is formed from the instance name.
         org_name (str): This stores `org_name` arg.
         org_key (str): This stores `org_key` arg.
+
+    The client keeps its connections to the service alive and reuses them across calls, so that
+    only the first call pays for the TCP and TLS handshakes.  It is safe to share a client among
+    threads.  The clients that are given neither `session`, `pool_size` nor `connection_retries`
+    share one module-level session, and so its pool of connections, or with HTTP/2 its
+    connections and their streams, even across orgs.  The other clients have a session of their
+    own, which `close()`, or using the client in a `with` statement, closes.
+
+    Example:
+        with RegistryClient("useast2", "my_org", "my_org_key") as client:
+            print(client.describe_org())
     """
-    def __init__(self, instance, org_name, org_key):
+    def __init__(
+            self, instance: str, org_name: str, org_key: str, pool_size: Optional[int] = None,
+            connection_retries: Optional[int] = None, http2: bool = False, session: Any = None) -> None:
         self.service_url = f"https://{instance}.registry.dkplatform.io/svc/"
         self.org_name = org_name
+        self._set_org_key(org_key)
+        self._pool_size = _DEFAULT_POOL_SIZE if pool_size is None else pool_size
+        self._connection_retries = 0 if connection_retries is None else connection_retries
+        self._http2 = http2
+        # The URLs are built by concatenating onto these.
+        self._org_url = f"{self.service_url}/{self.org_name}"
+        self._url_prefix = self._org_url + "/"
+        self._uses_default_session = session is None and pool_size is None and connection_retries is None
+        self._owns_session = session is None and not self._uses_default_session
+        if session is not None:
+            self._session = session
+        elif self._uses_default_session:
+            self._session = _default_session(http2)
+        else:
+            self._session = _new_session(http2, self._pool_size, self._connection_retries)
+        # The results of the read operations that are called with `cache_ttl_secs`, keyed by URL.
+        self._cache = {}
+        # Counts the invalidations, so that a read that overlaps one doesn't cache its result.
+        self._cache_generation = 0
+        _clients.add(self)
+
+    def __enter__(self) -> "RegistryClient":
+        return self
+
+    def __exit__(
+            self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+            traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the connections to the service, unless the session is shared with other clients.
+        """
+        if self._owns_session:
+            self._session.close()
+
+    def _set_org_key(self, org_key: str) -> None:
         self.org_key = org_key
+        # The session may be shared across orgs, so the credential goes with each request.
+        self._auth_headers = {"Authorization": org_key}
+        self._json_headers = {"Authorization": org_key, "Content-Type": "application/json"}
 
-    GenericErrorMessages = {
-        400: "Bad request",
-        403: "Forbidden",
-        404: "Not found",
-        409: "Conflict",
-        413: "Payload too large",
-        500: "Internal server error",
-        503: "Request collision",
-        507: "Insufficient storage"
-    }
+    def _request(
+            self, method: str, url: str, data: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None,
+            **kwargs: Any) -> Any:
+        """
+        Send a request with either `requests` or `httpx`, whose responses have the same interface
+        for what the client uses.  `headers` must include the Authorization header, which is sent
+        alone when `headers` is None.
+        """
+        if headers is None:
+            headers = self._auth_headers
+        if self._http2:
+            # httpx takes raw bodies as `content`, and `data` for forms only.
+            return self._session.request(method, url, content=data, headers=headers, **kwargs)
+        return self._session.request(method, url, data=data, headers=headers, **kwargs)
+
+    def _mutating_request(
+            self, method: str, url: str, data: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None,
+            **kwargs: Any) -> Any:
+        """
+        Send a request like `_request`, of an operation that changes the org, and then invalidate the
+        cached results, which it may affect.  The invalidation happens once the response has arrived,
+        or the request has failed, so that the cache can't be filled with what a read concurrent with
+        the request returned from before the change.
+        """
+        try:
+            return self._request(method, url, data, headers, **kwargs)
+        finally:
+            self._invalidate_cache()
 
-    """Header names."""
-    CONTENT_TYPE = "Content-Type"
-    X_DK_ORG_TIME = "x-dk-org-time"
-    X_DK_CREATE_ORG_TIME = "x-dk-create-org-time"
-    X_DK_UPDATE_ORG_TIME = "x-dk-update-org-time"
+    def _invalidate_cache(self) -> None:
+        self._cache_generation += 1
+        self._cache.clear()
 
-    def _extract_json_from_response(self, response):
+    @contextlib.contextmanager
+    def _stream(self, method: str, url: str, chunk_size: int) -> Iterator[Tuple[Any, Iterator[bytes]]]:
         """
-        Extract JSON data from the response if the response content is in JSON format.
-
-        Args:
-            response (requests.models.Response): The response object from the HTTP request.
+        Send a request, and yield its response before the body is read, together with an iterator
+        over the body in chunks of up to `chunk_size` bytes.  The body of an error response is read
+        up front, so that it can be reported as usual.
+        """
+        if self._http2:
+            with self._session.stream(method, url, headers=self._auth_headers) as response:
+                if response.status_code != 200:
+                    response.read()
+                yield response, response.iter_bytes(chunk_size)
+        else:
+            with self._session.request(method, url, headers=self._auth_headers, stream=True) as response:
+                yield response, response.iter_content(chunk_size)
 
-        Returns:
-            dict or None: JSON data if the response is in JSON format, otherwise None.
+    def _cached_get(self, url: str, cache_ttl_secs: float, fetch: Callable[[Any], Any]) -> Any:
         """
-        if "application/json" in response.headers.get("content-type", ""):
-            try:
-                return response.json()
-            except:
-                return None
+        Return the cached result for `url` if it is younger than `cache_ttl_secs`, or else the result
+        of `fetch(stale)`, which is then cached.  `stale` is the expired result, or None, which
+        `fetch` may use to revalidate rather than refetch.  The cache is invalidated by every
+        operation that changes the org through this client.
+        """
+        now = time.monotonic()
+        entry = self._cache.get(url)
+        if entry is not None and now - entry[0] < cache_ttl_secs:
+            return entry[1]
+        generation = self._cache_generation
+        result = fetch(entry[1] if entry is not None else None)
+        # A change during the read may have landed after what the read returned.
+        if self._cache_generation == generation:
+            self._cache[url] = (now, result)
+        return result
+
+    # The module-level constants are what the methods use.  These aliases are kept for the callers.
+    GenericErrorMessages = _GENERIC_ERROR_MESSAGES
 
-    def take_role(self, role_path, player_name, playtime_secs=None, max_players=None):
+    """Header names."""
+    CONTENT_TYPE = _CONTENT_TYPE
+    X_DK_ORG_TIME = _X_DK_ORG_TIME
+    X_DK_CREATE_ORG_TIME = _X_DK_CREATE_ORG_TIME
+    X_DK_UPDATE_ORG_TIME = _X_DK_UPDATE_ORG_TIME
+
+    def take_role(
+            self, role_path: str, player_name: str, playtime_secs: Optional[int] = None,
+            max_players: Optional[int] = None) -> TakeRoleResult:
         """
         Refer to the HTTP API Document for the details.
 
@@ -396,11 +692,7 @@ class RegistryClient:
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}/{role_path}.role"
-        headers = {
-            "Authorization": self.org_key,
-            "Content-Type": "application/json"
-        }
+        url = _role_url(self._url_prefix, role_path)
         
         client_unix_time_in_msecs = int(time.time() * 1000)  # Current local epoch time in milliseconds
         
@@ -413,26 +705,55 @@ class RegistryClient:
         if max_players is not None:
             data["max_players"] = max_players
 
-        response = requests.put(url, headers=headers, json=data)
+        response = self._mutating_request("PUT", url, headers=self._json_headers, json=data)
+        return self._take_role_result(response)
 
-        if response.status_code == 200:
-            json = self._extract_json_from_response(response)
-            return TakeRoleResult(
-                int(response.headers.get(self.X_DK_ORG_TIME)),
-                False,
-                json.get("client_expiration_time_in_msecs"))
-        elif response.status_code == 201:
-            json = self._extract_json_from_response(response)
+    def prepare_take_role(
+            self, role_path: str, player_name: str, playtime_secs: Optional[int] = None,
+            max_players: Optional[int] = None) -> Callable[[], TakeRoleResult]:
+        """
+        Prepare a take-role operation that is performed repeatedly with the same arguments, such as
+        for renewing a role.  The URL and the request body, except for the client time, are built
+        once here instead of on every call.
+
+        Args:
+            Same as `take_role`.
+
+        Returns:
+            callable: It takes no args and performs the operation as `take_role` does.  It returns
+                TakeRoleResult, and raises RegistryError.
+        """
+        url = _role_url(self._url_prefix, role_path)
+        data = {
+            "player_name": player_name
+        }
+        if playtime_secs is not None:
+            data["playtime_secs"] = playtime_secs
+        if max_players is not None:
+            data["max_players"] = max_players
+        # The client time goes last, so that only it has to be appended to the serialized body.
+        body_prefix = (json.dumps(data)[:-1] + ', "client_unix_time_in_msecs": ').encode()
+
+        def take_role() -> TakeRoleResult:
+            client_unix_time_in_msecs = int(time.time() * 1000)  # Current local epoch time in milliseconds
+            body = body_prefix + str(client_unix_time_in_msecs).encode() + b"}"
+            response = self._mutating_request("PUT", url, headers=self._json_headers, data=body)
+            return self._take_role_result(response)
+        return take_role
+
+    def _take_role_result(self, response: Any) -> TakeRoleResult:
+        if response.status_code == 200 or response.status_code == 201:
+            h = response.headers
+            # Renewals parse this response on every tick, so decode the body directly.
+            json = _json_loads(response.content)
             return TakeRoleResult(
-                int(response.headers.get(self.X_DK_ORG_TIME)),
-                True,
+                int(h[_X_DK_ORG_TIME]),
+                response.status_code == 201,
                 json.get("client_expiration_time_in_msecs"))
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            extra_json = self._extract_json_from_response(response)
-            raise RegistryError(response.status_code, error_message, extra_json)
+            _raise_error(response)
 
-    def release_role(self, role_path, player_name):
+    def release_role(self, role_path: str, player_name: str) -> ReleaseRoleResult:
         """
         Refer to the HTTP API Document for the details.
 
@@ -446,31 +767,28 @@ class RegistryClient:
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}/{role_path}.role"
-        headers = {
-            "Authorization": self.org_key,
-            "Content-Type": "application/json"
-        }
+        url = _role_url(self._url_prefix, role_path)
 
         data = {
             "player_name": player_name
         }
 
-        response = requests.delete(url, headers=headers, json=data)
+        response = self._mutating_request("DELETE", url, headers=self._json_headers, json=data)
 
         if response.status_code == 200:
-            return ReleaseRoleResult(int(response.headers.get(self.X_DK_ORG_TIME)))
+            h = response.headers
+            return ReleaseRoleResult(int(h[_X_DK_ORG_TIME]))
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            extra_json = self._extract_json_from_response(response)
-            raise RegistryError(response.status_code, error_message, extra_json)
+            _raise_error(response)
 
-    def read_role(self, role_path):
+    def read_role(self, role_path: str, cache_ttl_secs: Optional[float] = None) -> ReadRoleResult:
         """
         Refer to the HTTP API Document for the details.
 
         Args:
             role_path (str): The combined path and role name (without the ".role" suffix).
+            cache_ttl_secs (float, optional): When provided, a result of the same operation that is
+                younger than `cache_ttl_secs` seconds is returned without contacting the service.
 
         Returns:
             ReadRoleResult
@@ -478,32 +796,32 @@ class RegistryClient:
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}/{role_path}.role"
-        headers = {
-            "Authorization": self.org_key
-        }
-
-        response = requests.get(url, headers=headers)
+        url = _role_url(self._url_prefix, role_path)
+        if cache_ttl_secs:
+            return self._cached_get(url, cache_ttl_secs, lambda stale: self.read_role(role_path))
+        response = self._request("GET", url)
 
         if response.status_code == 200:
-            json = self._extract_json_from_response(response)
+            h = response.headers
+            json = _extract_json(response)
             return ReadRoleResult(
-                int(response.headers.get(self.X_DK_ORG_TIME)),
+                int(h[_X_DK_ORG_TIME]),
                 json.get("default_playtime_secs"),
                 json.get("max_players"),
                 json.get("players_remaining_milliseconds"))
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            extra_json = self._extract_json_from_response(response)
-            raise RegistryError(response.status_code, error_message, extra_json)
+            _raise_error(response)
 
-    def write_data(self, data_item_path, data, content_type="application/json", update_org_time=None):
+    def write_data(
+            self, data_item_path: str, data: Any, content_type: str = "application/json",
+            update_org_time: Optional[int] = None) -> WriteDataResult:
         """
         Refer to the HTTP API Document for the details.
 
         Args:
             data_item_path (str): The combined path and data item name (without the ".data" suffix).
-            data: The data to be stored.
+            data: The data to be stored.  A str is sent UTF-8 encoded, and a dict or list is sent
+                serialized as JSON when `content_type` is "application/json".
             content_type (str, optional): The content type of the data. Default is "application/json".
             update_org_time (int, optional): A conditional write only happens if `update_org_time` matched.
 
@@ -513,7 +831,7 @@ class RegistryClient:
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}/{data_item_path}.data"
+        url = _data_url(self._url_prefix, data_item_path)
         headers = {
             "Authorization": self.org_key,
             "Content-Type": content_type,
@@ -522,28 +840,27 @@ class RegistryClient:
         if update_org_time is not None:
             headers["x-dk-update-org-time"] = str(update_org_time)
 
-        response = requests.put(url, headers=headers, data=data)
-        json = self._extract_json_from_response(response)
+        # The body is sent as bytes, whose length is known up front.
+        if isinstance(data, str):
+            data = data.encode()
+        elif isinstance(data, (dict, list)) and content_type == "application/json":
+            data = _json_dumps(data)
 
-        if response.status_code == 200:
-            return WriteDataResult(
-                int(response.headers.get(self.X_DK_ORG_TIME)),
-                False,
-                json.get("create_org_time"),
-                json.get("update_org_time"),
-                json.get("number_of_bytes_written"))
-        elif response.status_code == 201:
+        response = self._mutating_request("PUT", url, headers=headers, data=data)
+
+        if response.status_code == 200 or response.status_code == 201:
+            h = response.headers
+            json = _extract_json(response)
             return WriteDataResult(
-                int(response.headers.get(self.X_DK_ORG_TIME)),
-                True,
+                int(h[_X_DK_ORG_TIME]),
+                response.status_code == 201,
                 json.get("create_org_time"),
                 json.get("update_org_time"),
                 json.get("number_of_bytes_written"))
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            raise RegistryError(response.status_code, error_message, json)
+            _raise_error(response)
 
-    def delete_data(self, data_item_path, update_org_time=None):
+    def delete_data(self, data_item_path: str, update_org_time: Optional[int] = None) -> DeleteDataResult:
         """
         Refer to the HTTP API Document for the details.
 
@@ -557,61 +874,118 @@ class RegistryClient:
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}/{data_item_path}.data"
-        headers = {
-            "Authorization": self.org_key
-        }
-
+        url = _data_url(self._url_prefix, data_item_path)
+        headers = None
         if update_org_time is not None:
-            headers["x-dk-update-org-time"] = str(update_org_time)
+            headers = {"Authorization": self.org_key, "x-dk-update-org-time": str(update_org_time)}
 
-        response = requests.delete(url, headers=headers)
+        response = self._mutating_request("DELETE", url, headers=headers)
 
         if response.status_code == 200:
-            return DeleteDataResult(int(response.headers.get(self.X_DK_ORG_TIME)))
+            h = response.headers
+            return DeleteDataResult(int(h[_X_DK_ORG_TIME]))
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            extra_json = self._extract_json_from_response(response)
-            raise RegistryError(response.status_code, error_message, extra_json)
+            _raise_error(response)
 
-    def read_data(self, data_item_path):
+    def read_data(
+            self, data_item_path: str, cache_ttl_secs: Optional[float] = None,
+            if_none_match: Optional[int] = None) -> ReadDataResult:
         """
         Refer to the HTTP API Document for the details.
 
         Args:
             data_item_path (str): The combined path and data item name (without the ".data" suffix).
+            cache_ttl_secs (float, optional): When provided, a result of the same operation that is
+                younger than `cache_ttl_secs` seconds is returned without contacting the service.
+                An older result is revalidated with `if_none_match`, and is returned again if the
+                data item is unchanged.
+            if_none_match (int, optional): The `update_org_time` of the content that the caller
+                has.  If the data item hasn't been updated since, the service may respond
+                "Not modified" (304) without the content.
 
         Returns:
-            ReadDataResult
+            ReadDataResult: On "Not modified", its `content` is None, and its `update_org_time` is
+                `if_none_match`.
 
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}/{data_item_path}.data"
-        headers = {
-            "Authorization": self.org_key
-        }
+        url = _data_url(self._url_prefix, data_item_path)
+        if cache_ttl_secs and if_none_match is None:
+            return self._cached_get(url, cache_ttl_secs, lambda stale: self._revalidate_data(data_item_path, stale))
+        headers = None
+        if if_none_match is not None:
+            headers = {"Authorization": self.org_key, "If-None-Match": f'"{if_none_match}"'}
 
-        response = requests.get(url, headers=headers)
+        response = self._request("GET", url, headers=headers)
 
         if response.status_code == 200:
+            h = response.headers
             return ReadDataResult(
-                int(response.headers.get(self.X_DK_ORG_TIME)),
-                int(response.headers.get(self.X_DK_CREATE_ORG_TIME)),
-                int(response.headers.get(self.X_DK_UPDATE_ORG_TIME)),
-                response.headers.get(self.CONTENT_TYPE),
+                int(h[_X_DK_ORG_TIME]),
+                int(h[_X_DK_CREATE_ORG_TIME]),
+                int(h[_X_DK_UPDATE_ORG_TIME]),
+                h[_CONTENT_TYPE],
                 response.content)
+        elif response.status_code == 304 and if_none_match is not None:
+            h = response.headers
+            org_time = h.get(_X_DK_ORG_TIME)
+            create_org_time = h.get(_X_DK_CREATE_ORG_TIME)
+            return ReadDataResult(
+                int(org_time) if org_time is not None else None,
+                int(create_org_time) if create_org_time is not None else None,
+                if_none_match,
+                None,
+                None)
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            extra_json = self._extract_json_from_response(response)
-            raise RegistryError(response.status_code, error_message, extra_json)
+            _raise_error(response)
 
-    def list_items(self, directory_path):
+    def _revalidate_data(self, data_item_path: str, stale: Optional[ReadDataResult]) -> ReadDataResult:
+        if stale is None:
+            return self.read_data(data_item_path)
+        result = self.read_data(data_item_path, if_none_match=stale.update_org_time)
+        # The cached content is still current if the service did not send it again.
+        return stale if result.content is None else result
+
+    def read_data_to(self, data_item_path: str, sink: BinaryIO, chunk_size: int = 1 << 16) -> ReadDataResult:
+        """
+        Read a data item like `read_data`, but write its content to `sink` as it arrives, instead of
+        holding all of it in memory.
+
+        Args:
+            data_item_path (str): The combined path and data item name (without the ".data" suffix).
+            sink: A writable binary file-like object, e.g., a file opened with "wb".
+            chunk_size (int, optional): The most bytes written to `sink` at a time.  Default is 64 KiB.
+
+        Returns:
+            ReadDataResult: Its `content` is None, as the content has been written to `sink`.
+
+        Raises:
+            RegistryError
+        """
+        url = _data_url(self._url_prefix, data_item_path)
+        with self._stream("GET", url, chunk_size) as (response, chunks):
+            if response.status_code == 200:
+                for chunk in chunks:
+                    sink.write(chunk)
+                h = response.headers
+                return ReadDataResult(
+                    int(h[_X_DK_ORG_TIME]),
+                    int(h[_X_DK_CREATE_ORG_TIME]),
+                    int(h[_X_DK_UPDATE_ORG_TIME]),
+                    h[_CONTENT_TYPE],
+                    None)
+            else:
+                _raise_error(response)
+
+    def list_items(self, directory_path: str, cache_ttl_secs: Optional[float] = None) -> ListItemsResult:
         """
          Refer to the HTTP API Document for the details.
 
         Args:
             directory_path (str): The path of the directory, must end with a slash ("/").
+            cache_ttl_secs (float, optional): When provided, a result of the same operation that is
+                younger than `cache_ttl_secs` seconds is returned without contacting the service.
 
         Returns:
             ReadDirectoryResult
@@ -619,27 +993,25 @@ class RegistryClient:
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}/{directory_path}/"
-        headers = {
-            "Authorization": self.org_key
-        }
-
-        response = requests.get(url, headers=headers)
+        url = _directory_url(self._url_prefix, directory_path)
+        if cache_ttl_secs:
+            return self._cached_get(url, cache_ttl_secs, lambda stale: self.list_items(directory_path))
+        response = self._request("GET", url)
 
         if response.status_code == 200:
-            json = self._extract_json_from_response(response)
+            h = response.headers
+            json = _extract_json(response)
+            stats = json["stats"]
             return ListItemsResult(
-                int(response.headers.get(self.X_DK_ORG_TIME)),
+                int(h[_X_DK_ORG_TIME]),
                 json.get("files"),
                 ListStats(
-                    int(json.get("stats").get("role_count")),
-                    int(json.get("stats").get("data_item_count"))))
+                    int(stats["role_count"]),
+                    int(stats["data_item_count"])))
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            extra_json = self._extract_json_from_response(response)
-            raise RegistryError(response.status_code, error_message, extra_json)
+            _raise_error(response)
 
-    def rotate_org_key(self, new_org_key=None):
+    def rotate_org_key(self, new_org_key: Optional[str] = None) -> RotateOrgKeyResult:
         """
         Refer to the HTTP API Document for the details.
 
@@ -652,58 +1024,55 @@ class RegistryClient:
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}"
-        headers = {
-            "Authorization": self.org_key,
-            "Content-Type": "application/json"
-        }
+        url = self._org_url
 
         data = {}
         if new_org_key is not None:
             data["org_key"] = new_org_key
 
-        response = requests.put(url, headers=headers, json=data)
+        response = self._mutating_request("PUT", url, headers=self._json_headers, json=data)
 
         if response.status_code == 200:
-            json = self._extract_json_from_response(response)
-            self.org_key = json.get("org_key")
+            h = response.headers
+            json = _extract_json(response)
+            self._set_org_key(json.get("org_key"))
             return RotateOrgKeyResult(
-                int(response.headers.get(self.X_DK_ORG_TIME)),
+                int(h[_X_DK_ORG_TIME]),
                 self.org_key)
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            extra_json = self._extract_json_from_response(response)
-            raise RegistryError(response.status_code, error_message, extra_json)
+            _raise_error(response)
 
-    def describe_org(self):
+    def describe_org(self, cache_ttl_secs: Optional[float] = None) -> DescribeOrgResult:
         """
         Refer to the HTTP API Document for the details.
 
+        Args:
+            cache_ttl_secs (float, optional): When provided, a result of the same operation that is
+                younger than `cache_ttl_secs` seconds is returned without contacting the service.
+
         Returns:
             dict: A dictionary containing the org's information.
 
         Raises:
             RegistryError
         """
-        url = f"{self.service_url}/{self.org_name}"
-        headers = {
-            "Authorization": self.org_key
-        }
-
-        response = requests.get(url, headers=headers)
+        url = self._org_url
+        if cache_ttl_secs:
+            return self._cached_get(url, cache_ttl_secs, lambda stale: self.describe_org())
+        response = self._request("GET", url)
 
         if response.status_code == 200:
-            json = self._extract_json_from_response(response)
+            h = response.headers
+            json = _extract_json(response)
+            stats = json["stats"]
             return DescribeOrgResult(
                 json.get("org_name"),
                 json.get("org_key"),
-                int(response.headers.get(self.X_DK_ORG_TIME)),
+                int(h[_X_DK_ORG_TIME]),
                 json.get("is_deleted") == True,
                 OrgStats(
-                    json.get("stats").get("total_role_count"),
-                    json.get("stats").get("total_data_item_count"),
-                    json.get("stats").get("total_data_size")))
+                    stats.get("total_role_count"),
+                    stats.get("total_data_item_count"),
+                    stats.get("total_data_size")))
         else:
-            error_message = self.GenericErrorMessages.get(response.status_code, "Unknown error")
-            extra_json = self._extract_json_from_response(response)
-            raise RegistryError(response.status_code, error_message, extra_json)
+            _raise_error(response)
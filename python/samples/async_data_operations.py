@@ -0,0 +1,53 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) 2024 DK Lab, LLC. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+# To run, need PYTHONPATH to point to async_registry_client.py, and aiohttp installed.
+# Example: % PYTHONPATH=/Users/dklab/RegistryClients/python/ python3 async_data_operations.py
+
+import asyncio
+
+from async_registry_client import AsyncRegistryClient
+from registry_client import RegistryError
+
+ORG_NAME = "sample_org"
+ORG_KEY = "randomAlphaNumericString"
+INSTANCE = "beta.useast2"
+
+RECIPES = {
+    "/nemmies/rolls/recipe_1": "The secret ingredient is passion!!",
+    "/nemmies/rolls/recipe_2": "The secret ingredient is patience!!",
+    "/nemmies/rolls/recipe_3": "The secret ingredient is practice!!",
+}
+
+async def main():
+    async with AsyncRegistryClient(INSTANCE, ORG_NAME, ORG_KEY) as client:
+        try:
+            # The operations on different data items are independent, so they are issued concurrently.
+            print("Write the recipes:")
+            writes = await client.write_data_many(
+                [(path, recipe, "text/plain") for (path, recipe) in RECIPES.items()])
+            for write in writes:
+                print(write)
+
+            after = await client.list_items("/nemmies/")
+            print(f"\nAfter writing:\n{after}\n")
+
+            print("Read the recipes:")
+            reads = await asyncio.gather(*[client.read_data(path) for path in RECIPES])
+            for read in reads:
+                print(read)
+
+            print("\nDelete the recipes:")
+            deletes = await asyncio.gather(*[client.delete_data(path) for path in RECIPES])
+            for delete in deletes:
+                print(delete)
+
+            final = await client.list_items("/nemmies/")
+            print(f"\nAfter deleting:\n{final}\n")
+
+        except RegistryError as e:
+            print(f"ErrorCode: {e.http_code}, ErrorMessage: {e.message}")
+
+asyncio.run(main())
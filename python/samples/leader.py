@@ -6,7 +6,7 @@
 # To run, need PYTHONPATH to point to registry_client.py.
 # Example: % PYTHONPATH=/Users/dklab/RegistryClients/python/ python3 leader.py
 
-from random import randint
+from random import randint, uniform
 import threading
 import time
 
@@ -17,29 +17,42 @@ ORG_KEY = "randomAlphaNumericString"
 INSTANCE = "beta.useast2"
 
 RUN_TIME_SECS = 30
+# Usually `playtime_secs` is greater than 3. Use a small number here to
+# demonstrate the leader election more effectively.
+PLAYTIME_SECS = 3
+# A chef that fails to take the role backs off exponentially, with jitter, so that the chefs
+# don't keep retrying in lockstep.
+BACKOFF_BASE_SECS = 2
+BACKOFF_MAX_SECS = 8
+
+# The chefs share the client, which is thread safe, and so its kept-alive connections.
+client = RegistryClient(INSTANCE, ORG_NAME, ORG_KEY)
 
 def elect_leader(name):
-    client = RegistryClient(INSTANCE, ORG_NAME, ORG_KEY)
     is_leader = False
     expiration = 0
+    failures = 0  # The consecutive failures to take the role.
     t_end = time.time() + RUN_TIME_SECS
     while time.time() < t_end:
         try:
-            # Usually `playtime_secs` is greater than 3. Use a small number here to
-            # demonstrate the leader election more effectively.
             expiration = client.take_role(
-                "/nemmies/rolls/chef", name, playtime_secs=3, max_players=1,
+                "/nemmies/rolls/chef", name, playtime_secs=PLAYTIME_SECS, max_players=1,
                 ).client_expiration_time_in_msecs
+            failures = 0
             if not is_leader:
                 is_leader = True
                 timestamp = int(time.time() * 1000)
                 print(f"{name} becomes the leader at UNIX time {timestamp}")
         except RegistryError as e:
+            failures += 1
             if e.http_code == 409 and is_leader:
                 is_leader = False
                 print(f"{name}'s leadership ended at UNIX time {expiration}")
-        # Doing some leader work as long as `expiration` timestamp isn't passed.
-        time.sleep(randint(2,5))
+        if failures == 0:
+            # Doing some leader work as long as `expiration` timestamp isn't passed.
+            time.sleep(randint(2,5))
+        else:
+            time.sleep(uniform(BACKOFF_BASE_SECS, min(BACKOFF_BASE_SECS * 2 ** failures, BACKOFF_MAX_SECS)))
 
 if __name__ == "__main__":
     print("Two chefs compete to be the leader. Note that there's only one leader at any time.\n"
@@ -6,8 +6,10 @@
 """
 This code demonstrates the manager-worker pattern.  Our hypothetical problem is iterating
 over the natural numbers.  The manager's job is to assign ranges of numbers to the workers
-and collect their results.  Each worker, upon receiving a range from the manager, iterates
-over the numbers and returns the count.
+and collect their results.  Each worker, upon receiving a range from the manager, returns the
+count of the numbers in it.  By default the count is computed from the range, so that the
+demonstration exercises the bookkeeping and the messaging only.  Set `DEMO_CPU_WORK` to have the
+workers iterate over the numbers and count them, which models CPU-bound work.
 
 In this demonstration:
 - The problem state is small, and it is stored at the Registry Service.
@@ -27,19 +29,26 @@ In this demonstration:
     to replace a failed manger or worker.
 - Each machine has a UDP port, which is used for the manager to send assignment to the workers,
   and for the workers to send the results to the manager.  Manager and workers use their port
-  number as name, so the manager can learn about the workers (and hence their ports) by reading
-  the worker role.  Similarly, workers learn about the manager by reading the manager role.
+  number, followed by the boot count of the machine, as name, so the manager can learn about the
+  workers (and hence their ports) by reading the worker role.  The workers send each result back
+  to where its assignment came from.
 """
 
 # To run, need PYTHONPATH to point to leader_election.py.
 # Example: % PYTHONPATH=/Users/dklab/RegistryClients/python/ python3 manager_workers.py
 
+import errno
+import heapq
 import json
+import os
 import random
+import selectors
 import socket
+import struct
 import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
 
 import registry_client
@@ -55,6 +64,31 @@ NUM_WORKERS  = 5
 ASSIGNMENT_SIZE = 1000     # Each assignment has this many numbers.
 RESULT_WAIT_TIME_SECS = 1  # The manager waits for this many seconds for a worker to send back the result.
 RUN_TIME_SECS = 20         # The sample will run this many seconds.
+DEMO_CPU_WORK = False      # Whether the workers iterate through the numbers, instead of computing the count.
+
+# The messages are fixed-size binary records.  An assignment is (lower, higher), and a result is
+# (lower, higher, count, worker port), so a result starts with the packed assignment it is for.
+ASSIGNMENT_MSG = struct.Struct("<QQ")
+RESULT_MSG = struct.Struct("<QQQQ")
+
+# The socket buffer sizes, large enough to absorb the bursts of assignments and results.
+UDP_BUF_BYTES = int(os.environ.get("UDP_BUF_BYTES", 1 << 20))
+
+# The stack size of the threads.  A machine needs little stack, well below the default of several
+# megabytes per thread, so that many more machines can be modeled.
+THREAD_STACK_BYTES = 1 << 20
+
+# An idle machine retries taking the roles after a jittered delay that doubles on every failure,
+# up to 2 ** IDLE_BACKOFF_MAX_DOUBLINGS times the first, so that the idle machines don't retry in
+# lockstep, yet a failed manager or worker is still replaced within a few seconds.
+IDLE_BACKOFF_MAX_DOUBLINGS = 2
+
+def port_of(name):
+    """
+    Returns:
+        int:  The port of the machine, worker or manager named `name`.
+    """
+    return int(name.partition(".")[0])
 
 class ProblemState:
     """
@@ -65,42 +99,103 @@ class ProblemState:
 
     Attributes:
         next (int): The next number to assign to workers.
-        pending (dict): A dictionary mapping assignment ranges to their last assigned time.
-        busy_workers (dict): A dictionary of workers currently processing assignments.
+        pending (dict): A dictionary mapping assignment messages to their last assigned time.
+            Change it with `set_pending()` and `pop_pending()`.
+        pending_heap (list): A heap of the `(timestamp, message)` of the assignments, so the oldest
+            one is found without scanning `pending`.  An entry is stale once its timestamp is not
+            the one in `pending`, and the heap is not saved.
+        busy_workers (dict): A dictionary mapping the ports of the workers currently processing
+            assignments to the assignment messages.  Change it with `set_busy_worker()` and
+            `pop_busy_worker()`.
         finished (int): The total count of processed numbers.
+        dirty (bool): Whether the state has changed since it was last saved or loaded.  Whoever
+            changes the state sets it, so that `save()` only writes changes.
     """
     def __init__(self, saving_path):
         self.next = 0
         self.pending = {}
+        self.pending_heap = []
         self.busy_workers = {}
         self.finished = 0
+        self.dirty = False
+        # The JSON of each entry of `pending` and `busy_workers`, which is encoded when the entry is
+        # set, so that saving joins the entries instead of encoding all of them again.
+        self._pending_fragments = {}
+        self._busy_worker_fragments = {}
         self._saving_path = saving_path
         self._client = registry_client.RegistryClient(SVC_INSTANCE, ORG_NAME, ORG_KEY)
+
+    def set_pending(self, message, timestamp):
+        """
+        Track the assignment `message` as pending since `timestamp`.
+        """
+        self.pending[message] = timestamp
+        heapq.heappush(self.pending_heap, (timestamp, message))
+        # JSON has no bytes, so the messages are in hex.
+        self._pending_fragments[message] = b'"%s":%s' % (message.hex().encode(), json.dumps(timestamp).encode())
+        self.dirty = True
+
+    def pop_pending(self, message):
+        """
+        Returns:
+            float:  The timestamp of the assignment `message`, which is no longer pending, or None
+                if it wasn't pending.
+        """
+        timestamp = self.pending.pop(message, None)
+        if timestamp is not None:
+            del self._pending_fragments[message]
+            self.dirty = True
+        return timestamp
+
+    def set_busy_worker(self, worker, message):
+        """
+        Track the worker of port `worker` as busy with the assignment `message`.
+        """
+        self.busy_workers[worker] = message
+        # JSON has only str keys.
+        self._busy_worker_fragments[worker] = b'"%d":"%s"' % (worker, message.hex().encode())
+        self.dirty = True
+
+    def pop_busy_worker(self, worker):
+        """
+        Returns:
+            bytes:  The assignment message of the worker of port `worker`, which is no longer busy,
+                or None if it wasn't busy.
+        """
+        message = self.busy_workers.pop(worker, None)
+        if message is not None:
+            del self._busy_worker_fragments[worker]
+            self.dirty = True
+        return message
+
     def durable_json(self):
-        # Use double quotes around the fields, because it is what json.loads() needs.
-        return (
-            '{'
-            f'"next":{json.dumps(self.next)},'
-            f'"pending":{json.dumps(self.pending)},'
-            f'"busy_workers":{json.dumps(self.busy_workers)},'
-            f'"finished":{json.dumps(self.finished)}'
-            '}'
-        )
+        """
+        Returns:
+            bytes:  The JSON of the fields that are saved.
+        """
+        return b'{"next":%d,"pending":{%s},"busy_workers":{%s},"finished":%d}' % (
+            self.next,
+            b",".join(self._pending_fragments.values()),
+            b",".join(self._busy_worker_fragments.values()),
+            self.finished)
     def __repr__(self) -> str:
-        return f"ProblemState {self.durable_json()}"
+        return f"ProblemState {self.durable_json().decode()}"
 
     def save(self):
         """
-        Saves the object to Registry Service at the `_saving_path`.
+        Saves the object to Registry Service at the `_saving_path`, if it has changed.
 
         Returns:
             bool:  True on success, False otherwise.
         """
+        if not self.dirty:
+            return True
         try:
             self._client.write_data(
                 self._saving_path,
                 self.durable_json(),
                 "application/json")
+            self.dirty = False
             return True
         except registry_client.RegistryError as e:
             print(f"ProblemState.store: ErrorCode: {e.http_code}, ErrorMessage: {e.message}")
@@ -116,11 +211,17 @@ class ProblemState:
         try:
             read = self._client.read_data(self._saving_path)
             assert read.content_type == "application/json"
-            obj = json.loads(read.content.decode())
+            # json.loads() takes the bytes as they are.
+            obj = json.loads(read.content)
             self.next = obj['next']
-            self.pending = obj['pending']
-            self.busy_workers = obj['busy_workers']
+            (self.pending, self.pending_heap, self._pending_fragments) = ({}, [], {})
+            for (message, timestamp) in obj['pending'].items():
+                self.set_pending(bytes.fromhex(message), timestamp)
+            (self.busy_workers, self._busy_worker_fragments) = ({}, {})
+            for (port, message) in obj['busy_workers'].items():
+                self.set_busy_worker(int(port), bytes.fromhex(message))
             self.finished = obj['finished']
+            self.dirty = False
         except registry_client.RegistryError as e:
             print(f"ProblemState.load: ErrorCode: {e.http_code}, ErrorMessage: {e.message}")
         return self
@@ -144,61 +245,108 @@ class Manager:
         self._resp_wait_time = RESULT_WAIT_TIME_SECS
         self._assignment_range = ASSIGNMENT_SIZE
         self._problem = ProblemState(problem_state_path)
+        # The results are received into this buffer, instead of a new bytes per message.
+        self._recv_buf = bytearray(1024)
+        # The addresses of the workers by their ports, so that sending neither resolves "localhost"
+        # nor builds a new tuple per message.
+        self._worker_addresses = {}
+
+    # The most results received in one go, so that a burst of them doesn't delay the assigning.
+    MAX_RECV_BATCH = 64
 
     def _recv_results(self):
         """
         Receive as many results as possible without blocking, record them, and delete the tracking of the corresponding assignments.
         """
         try:
-            msg = self._sock.recv(1024)
-            while len(msg) > 0:
-                (lower, higher, count, worker) = msg.decode().split(",")
-                assert worker in self._problem.busy_workers
-                del self._problem.busy_workers[worker]
+            for _ in range(self.MAX_RECV_BATCH):
+                size = self._sock.recv_into(self._recv_buf)
+                if size == 0:
+                    break
+                if size != RESULT_MSG.size:
+                    continue
+                (_, _, count, worker) = RESULT_MSG.unpack_from(self._recv_buf)
+                # Each lookup pops, so that a key is probed once.  A worker that isn't busy sent a
+                # duplicate, e.g. of a result that the previous manager has already recorded.
+                if self._problem.pop_busy_worker(worker) is None:
+                    continue
                 # The assignment may have been sent to more than one workers (for fault tolerance).
-                # Record it only once, when the assignment is in pending.
-                assignment = f"{lower},{higher}"
-                if assignment in self._problem.pending:
-                    self._problem.finished += int(count)
-                    del self._problem.pending[assignment]
-                # Recv next msg.
-                msg = self._sock.recv(1024)
+                # Record it only once, when the assignment is in pending.  The result starts with
+                # the assignment message, which is the key as it is.
+                assignment = bytes(self._recv_buf[:ASSIGNMENT_MSG.size])
+                if self._problem.pop_pending(assignment) is not None:
+                    self._problem.finished += count
         except socket.error as se:
-            # Errno 35, Resource temporarily unavailable, is expected when a non-blocking socket has no data to recv.
-            if se.errno != 35:
+            # "Resource temporarily unavailable" is expected when a non-blocking socket has no data to recv.
+            if se.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
                 print(f"Manager {self._name} throws unexpected socket.error while recv: {se}")
         except Exception as e:
             print(f"Manager {self._name} throws unexpected exception while recv: {e}")
 
-    def _get_assignment(self):
+    def _get_assignment(self, now):
         """
         Get an assignment.  Prioritize the pending ones that are too old.
 
+        Args:
+            now (float):  The current time.time(), which the pending assignments are timestamped with.
+
         Returns:
-            tuple:  Represents an assignment range.
+            bytes:  The assignment message, which represents an assignment range.
         """
-        for (assignment, timestamp) in self._problem.pending.items():
-            if timestamp + self._resp_wait_time < time.time():
-                r = assignment.split(",")
-                return (int(r[0]), int(r[1]))
-        return (self._problem.next, self._problem.next + self._assignment_range)
+        # The heap pops the assignments by age.  The stale entries, of the assignments that have
+        # finished or been reassigned since, are dropped on the way.  The one returned is pushed
+        # again when it is sent.
+        heap = self._problem.pending_heap
+        while heap and heap[0][0] + self._resp_wait_time < now:
+            (timestamp, assignment) = heapq.heappop(heap)
+            if self._problem.pending.get(assignment) == timestamp:
+                # The worker that the assignment is overdue from is freed, or it would stay busy if
+                # it had crashed, as a rebooted machine keeps the port.  The few busy workers are
+                # scanned, only for the overdue assignments.
+                for (worker, message) in self._problem.busy_workers.items():
+                    if message == assignment:
+                        self._problem.pop_busy_worker(worker)
+                        break
+                return assignment
+        return ASSIGNMENT_MSG.pack(self._problem.next, self._problem.next + self._assignment_range)
+
+    def _assign(self, message, worker, now):
+        """
+        Record an assignment to a worker in the problem state, before it is sent.
+
+        Args:
+            message (bytes):  The assignment message, which is also its key in the problem state.
+            worker (int):  The port of the worker to whom the assignment is sent.
+            now (float):  The current time.time(), which the assignment is timestamped with.
 
-    def _send_assignment(self, assignment, worker):
+        Returns:
+            tuple:  The `(message, address)` to send.
+        """
+        address = self._worker_addresses.get(worker)
+        if address is None:
+            address = self._worker_addresses[worker] = ("127.0.0.1", worker)
+        (lower, higher) = ASSIGNMENT_MSG.unpack(message)
+        if higher > self._problem.next:
+            assert lower == self._problem.next  # Just to make sure we don't skip over any number.
+            self._problem.next = higher
+        self._problem.set_pending(message, now)
+        self._problem.set_busy_worker(worker, message)
+        return (message, address)
+
+    def _send_assignments(self, outbox):
         """
-        Send an assignment to a worker.
+        Send the assignments that have been recorded.  One that fails to be sent stays pending, and
+        is reassigned once it is overdue, while its worker is freed for another assignment.
 
         Args:
-            assignment (tuple):  A tuple representing the assignment range.
-            worker (str):  The name of the worker to whom the assignment is sent.
-        """
-        message = ",".join(map(str, (assignment[0], assignment[1])))
-        worker_port = int(worker)
-        self._sock.sendto(message.encode(), ("localhost", worker_port))
-        if assignment[1] > self._problem.next:
-            assert assignment[0] == self._problem.next  # Just to make sure we don't skip over any number.
-            self._problem.next = assignment[1]
-        self._problem.pending[message] = time.time()
-        self._problem.busy_workers[worker] = message
+            outbox (list):  The `(message, address)` of each assignment.
+        """
+        for (message, address) in outbox:
+            try:
+                self._sock.sendto(message, address)
+            except OSError as e:
+                print(f"Manager {self._name} fails to send an assignment to {address}: {e}")
+                self._problem.pop_busy_worker(address[1])
 
     def do_work(self, t_end):
         """
@@ -212,21 +360,32 @@ class Manager:
         self._problem.load()
         self._sock.setblocking(False)
         assigned = 0
+        workers = set()
         # Only perform the manager work when in the manager role.  And to make sure that the machine stays in
         # the manager role while performing the manager work, check that the machine is in the manager role in
         # the next 500 ms, assuming each iteration of the manager work takes less than 500 ms.
-        while t_end - time.time() >= 0.5 and self._role.is_holding(0.5):
+        while t_end - time.monotonic() >= 0.5 and self._role.is_holding(0.5):
             self._recv_results()
-            free_workers = self._workers.active_players() - self._problem.busy_workers.keys()
-            for worker in free_workers:
-                assignment = self._get_assignment()
-                self._send_assignment(assignment, worker)
-                assigned += 1
+            # The workers are named by their ports.  The players of the worker role change far less
+            # often than the manager iterates, so a read from the last 250 ms is used.  When the read
+            # fails, the workers last read are used.
+            players = self._workers.active_players_cached(0.25)
+            if players is not None:
+                workers = {port_of(worker) for worker in players}
+            free_workers = workers - self._problem.busy_workers.keys()
+            # The pending assignments are timestamped by the wall clock, as they are a part of the
+            # saved state, which the next manager may load on another machine.
+            now = time.time()
+            # All the assignments are recorded before any is sent, so that whatever is sent is tracked.
+            outbox = [self._assign(self._get_assignment(now), worker, now) for worker in free_workers]
+            self._send_assignments(outbox)
+            assigned += len(outbox)
             # One can select the saving frequency to balance between the duplicated work
             # when the manager fails and the overhead of saving in the normal case.  What
             # important is the integrity of the state.  That means any task that has been
             # assigned (sent to workers) must be either tracked as pending or have its
-            # result recorded.
+            # result recorded.  Saving only when the state has changed keeps the idle iterations
+            # off the network.
             self._problem.save()
         return assigned
 
@@ -235,15 +394,13 @@ class Worker:
     Represents a worker in the manager-worker framework.
 
     Args:
-        name (str):  The name of this worker.  In this example, it is the port that the worker receives msgs.
+        name (str):  The name of this worker.  In this example, it starts with the port that the worker receives msgs.
         role (leader_election.Role):  The `Role` that must be held to perform worker's work.
-        manager (leader_election.Role):  The `Role` to look up who the manager is.
         sock (socket.Socket): The UDP socket for sending/receiving messages to/from the manager.
     """
-    def __init__(self, name, role, manager, sock):
+    def __init__(self, name, role, sock):
         self._name = name
         self._role = role
-        self._manager = manager
         self._sock = sock
         
     def do_work(self, t_end):
@@ -251,76 +408,102 @@ class Worker:
         # and respond to the manager.
 
         solved = 0
-        # Only perform the worker work while in the worker role.
-        # Be sure to check that the machine is holding the role long enough to perform the work.
-        while t_end - time.time() >= 0.5 and self._role.is_holding(0.5):
-            # Do not spend all the time waiting for an assignment.  Reserve enough time to solve
-            # the assignment and send result to the manager.
-            self._sock.settimeout(0.4)
-            try:
-                msg = self._sock.recv(1024)
-                if len(msg) > 0:
-                    pair = msg.decode().split(",")
-                    lower, higher = int(pair[0]), int(pair[1])
-
-                    # Do the worker's work of iterating through the numbers.
-                    count = 0
-                    for i in range(lower, higher):
-                        count += 1
-
-                    players = self._manager.active_players()
-                    if len(players) == 1:
-                        manager_port = int(next(iter(players)))
-                        message = ",".join(map(str, (lower, higher, count, self._name)))
-                        self._sock.sendto(message.encode(), ("localhost", manager_port))
-                        solved += 1
-            except socket.timeout:
-                # The machine may not be a worker anymore, and so it stops waiting for an assignment.
-                pass
+        # Wait for the assignments with a selector, which is set up once, instead of setting a
+        # timeout on the socket for every recv.
+        self._sock.setblocking(False)
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._sock, selectors.EVENT_READ)
+            # Only perform the worker work while in the worker role.
+            # Be sure to check that the machine is holding the role long enough to perform the work.
+            while t_end - time.monotonic() >= 0.5 and self._role.is_holding(0.5):
+                # Do not spend all the time waiting for an assignment.  Reserve enough time to solve
+                # the assignment and send result to the manager.
+                if not selector.select(0.4):
+                    # The machine may not be a worker anymore, and so it stops waiting for an assignment.
+                    continue
+                try:
+                    (msg, manager_address) = self._sock.recvfrom(1024)
+                except BlockingIOError:
+                    # The readiness was spurious.
+                    continue
+                if len(msg) == ASSIGNMENT_MSG.size:
+                    lower, higher = ASSIGNMENT_MSG.unpack(msg)
+
+                    # Do the worker's work of iterating through the numbers.  The count is known
+                    # without the iterating, which only models CPU-bound work when asked to.
+                    if DEMO_CPU_WORK:
+                        count = 0
+                        for i in range(lower, higher):
+                            count += 1
+                    else:
+                        count = higher - lower
+
+                    # Reply to the manager that sent the assignment, rather than reading the
+                    # manager role from the service for every result.  If that machine is no longer
+                    # the manager, the result is dropped, and the new manager reassigns the range.
+                    message = RESULT_MSG.pack(lower, higher, count, port_of(self._name))
+                    self._sock.sendto(message, manager_address)
+                    solved += 1
         return solved
 
 class Machine:
-    def __init__(self, run_id, name, sock, termination_time):
+    def __init__(self, run_id, port, sock, termination_time):
         """
         Initializes a Machine instance.
 
         Args:
-            name (str):  The name of the machine.
+            port (int):  The port of the machine, which `sock` is bound to.
             socket (socket.socket):  A UDP socket to communicate with other machines.
             problem (Problem):  A Problem for the worker-manager system to solve.
-            termination_time (float):  The machine will stop when time.time() > termination_time.
+            termination_time (float):  The machine will stop when time.monotonic() > termination_time.
         """
-        self._name = name
+        self._port = port
+        self._boots = 0
+        self._name = None  # Named by each run.
         self._sock = sock
         self._termination_time = termination_time
 
-        manager_role_path = f"/manager_workers/{run_id}/manager"
-        worker_role_path  = f"/manager_workers/{run_id}/workers"
+        self._manager_role_path = f"/manager_workers/{run_id}/manager"
+        self._worker_role_path  = f"/manager_workers/{run_id}/workers"
 
         self.problem_state_path = f"/manager_workers/{run_id}/problem"
 
-        self._manager_role = Role(name, SVC_INSTANCE, ORG_NAME, ORG_KEY, manager_role_path, 1, 10)
-        self._worker_role  = Role(name, SVC_INSTANCE, ORG_NAME, ORG_KEY, worker_role_path, NUM_WORKERS, 10)
+        # The roles are created by each run.
+        self._manager_role = None
+        self._worker_role = None
 
     def run(self):
         """
-        Runs the machine.
+        Runs the machine, from its boot until it crashes.  A crashed machine may be run again, which
+        models a reboot.
         """
 
+        # A reboot starts with a new name and new roles, as if it were a new machine.  The roles of
+        # the previous run, which crashed without stepping down, stop being renewed once they are
+        # dropped here, and then expire, so that the failover is the same as for a new machine.
+        # The socket, and the connections to the Registry Service, survive the reboot.
+        self._boots += 1
+        self._name = f"{self._port}.{self._boots}"
+        self._manager_role = Role(self._name, SVC_INSTANCE, ORG_NAME, ORG_KEY, self._manager_role_path, 1, 10)
+        self._worker_role  = Role(
+            self._name, SVC_INSTANCE, ORG_NAME, ORG_KEY, self._worker_role_path, NUM_WORKERS, 10)
+
         # The machine is manufactured to run until `_termination_time`, but it may crash prematurely.
-        t_end = random.uniform(time.time(), self._termination_time)
+        t_end = random.uniform(time.monotonic(), self._termination_time)
 
         print(f"Machine {self._name} starts.")
         machine_status = "STARTED"
-        while time.time() < t_end:
+        idle_attempts = 0
+        while time.monotonic() < t_end:
             # Prioritize becoming the manager, because the system won't make any progress if there's no manager .
             if self._manager_role.take():
                 if machine_status != "MANAGER":
                     print(f"Machine {self._name}: {machine_status} -> MANAGER.")
                 else:
                     print(f"Machine {self._name} resumes being MANAGER.")
-                print(f"Current number of managers: {len(self._manager_role.active_players())}")
+                print(f"Current number of managers: {len(self._manager_role.active_players() or ())}")
                 machine_status = "MANAGER"
+                idle_attempts = 0
                 manager = Manager(self._name, self.problem_state_path, self._manager_role, self._worker_role, sock=self._sock)
                 assigned = manager.do_work(t_end)
                 print(f"Manager {self._name} has assigned {assigned} assignments." )
@@ -329,9 +512,10 @@ class Machine:
                     print(f"Machine {self._name}: {machine_status} -> WORKER.")
                 else:
                     print(f"Machine {self._name} resumes being WORKER.")
-                print(f"Current number of workers: {len(self._worker_role.active_players())}")
+                print(f"Current number of workers: {len(self._worker_role.active_players() or ())}")
                 machine_status = "WORKER"
-                worker = Worker(self._name, self._worker_role, self._manager_role, self._sock)
+                idle_attempts = 0
+                worker = Worker(self._name, self._worker_role, self._sock)
                 solved = worker.do_work(t_end)
                 print(f"Worker {self._name} has solved {solved} assignments.")
             else:
@@ -339,7 +523,8 @@ class Machine:
                 if machine_status != "IDLE":
                     print(f"Machine {self._name}: {machine_status} -> IDLE.")
                 machine_status = "IDLE"
-                time.sleep(1)
+                time.sleep(random.uniform(0.5, 1.5) * 2 ** min(idle_attempts, IDLE_BACKOFF_MAX_DOUBLINGS))
+                idle_attempts += 1
         # To model a crash, do not clean up resources, such as not stepping down from the role.
         # The role will expire and other will be able to take it.
         print(f"Machine {self._name} crashed.")
@@ -348,36 +533,78 @@ class Machine:
 class MachineFactory:
     """Factory class for creating Machine instances."""
 
-    # This lock is to ensure each socket is created and bound in isolation.
-    SOCK_LOCK = threading.RLock()
-
     def _create_udp_socket():
         """
         Creates a UDP socket and binds it to a random port.
 
+        The babysitters create their sockets concurrently.  Binding to port 0 has the kernel pick an
+        unused ephemeral port atomically, so no two sockets get the same port without a lock.
+
         Returns:
             socket.socket: The created UDP socket.
         """
-        with MachineFactory.SOCK_LOCK:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.bind(('', 0))
-            return sock
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('', 0))
+        for (option, option_name) in ((socket.SO_RCVBUF, "SO_RCVBUF"), (socket.SO_SNDBUF, "SO_SNDBUF")):
+            sock.setsockopt(socket.SOL_SOCKET, option, UDP_BUF_BYTES)
+            # The kernel may cap the size, e.g., by net.core.rmem_max and wmem_max on Linux.
+            applied = sock.getsockopt(socket.SOL_SOCKET, option)
+            if applied < UDP_BUF_BYTES:
+                print(f"{option_name} is capped at {applied} bytes, below the requested {UDP_BUF_BYTES}.")
+        return sock
 
     def create_machine(run_id, termination_time):
         """
         Create a new Machine instance.
         """
         sock = MachineFactory._create_udp_socket()
-        name = f"{sock.getsockname()[1]}"
-        return Machine(run_id, name, sock, termination_time)
+        return Machine(run_id, sock.getsockname()[1], sock, termination_time)
+
+class TokenBucket:
+    """
+    Limits the rate of an action, while allowing bursts of it.
 
-def babysit(run_id, t_end):
+    Args:
+        rate (float):  The number of tokens added per second.
+        capacity (int):  The most tokens the bucket holds, which is also the largest burst.  The
+            bucket starts full.
+    """
+    def __init__(self, rate, capacity):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """
+        Take a token, waiting for one to be added if the bucket is empty.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * self._rate)
+                self._refilled = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+def babysit(run_id, t_end, boots):
     """
-    This monitors a machine and, if it crashes, replaces with a new one.
+    This monitors a machine and, if it crashes, reboots it.  Each boot takes a token from `boots`,
+    so that the machines that crash together don't all race for the roles at the same time.  An
+    unexpected exception crashes the machine too, which is rebooted like any other crash, instead
+    of ending the run.
     """
-    while time.time() < t_end:
-        machine = MachineFactory.create_machine(run_id, t_end)
-        machine.run()
+    machine = MachineFactory.create_machine(run_id, t_end)
+    while time.monotonic() < t_end:
+        boots.take()
+        try:
+            machine.run()
+        except Exception as e:
+            print(f"Machine {machine._name} crashed on an unexpected exception: {e!r}")
 
 
 if __name__ == "__main__":
@@ -386,17 +613,18 @@ if __name__ == "__main__":
     """
 
     run_id = uuid.uuid1().__str__().replace("-", "_")
-    t_end = time.time() + RUN_TIME_SECS
+    # The deadlines are per the monotonic clock, which adjustments to the wall clock don't move.
+    t_end = time.monotonic() + RUN_TIME_SECS
 
     # We will run NUM_WORKERS machines for workers, 1 machine for manager, and 2 redundant machines for fault tolerance.
     num_machines = NUM_WORKERS + 1 + 2
-    sitters = []
-    for i in range (num_machines):
-        t = threading.Thread(target=babysit, args=(run_id, t_end))
-        t.start()
-        sitters.append(t)
-    for t in sitters:
-        t.join()
+    threading.stack_size(THREAD_STACK_BYTES)
+    # All the machines boot at once, and then the reboots are limited to about one per machine per
+    # second, which smooths the load on the Registry Service.
+    boots = TokenBucket(num_machines, num_machines)
+    with ThreadPoolExecutor(num_machines) as executor:
+        # Consuming the results surfaces the exception of any babysitter.
+        list(executor.map(babysit, [run_id] * num_machines, [t_end] * num_machines, [boots] * num_machines))
 
     # Report the run's results to console.
     print(f"\nRun {run_id} Summary:")
@@ -0,0 +1,116 @@
+#   ---------------------------------------------------------------------------------
+#   Copyright (c) 2024 DK Lab, LLC. All rights reserved.
+#   Licensed under the MIT License. See LICENSE in project root for information.
+#   ---------------------------------------------------------------------------------
+
+# To run, from the python directory: % python3 -m unittest discover -s tests
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from leader_election import Role
+from registry_client import RegistryError, ReleaseRoleResult, TakeRoleResult
+
+class StubClient:
+    """
+    Stands in for `RegistryClient`, without the service.  It records the calls, and fails the
+    take-role requests while `failing` is set.
+    """
+    def __init__(self, take_delay_secs=0):
+        self.takes = 0
+        self.releases = 0
+        self.failing = False
+        self._take_delay_secs = take_delay_secs
+        self._lock = threading.Lock()
+
+    def prepare_take_role(self, role_path, player_name, playtime_secs=None, max_players=None):
+        def take_role():
+            with self._lock:
+                self.takes += 1
+            time.sleep(self._take_delay_secs)
+            if self.failing:
+                raise RegistryError(409, "Conflict")
+            now_msecs = int(time.time() * 1000)
+            return TakeRoleResult(now_msecs, True, now_msecs + int(playtime_secs * 1000))
+        return take_role
+
+    def release_role(self, role_path, player_name):
+        with self._lock:
+            self.releases += 1
+        return ReleaseRoleResult(int(time.time() * 1000))
+
+def new_role(playtime_secs, client):
+    role = Role("player", "instance", "org", "key", "/tests/role", 1, playtime_secs)
+    role.client = client
+    return role
+
+class TestRoleRenewal(unittest.TestCase):
+    def test_renewal_extends_expiration(self):
+        client = StubClient()
+        role = new_role(1, client)
+        self.assertTrue(role.take())
+        expiration_ns = role._expiration_ns
+        # Past the first retake interval, which is at most half of the short playtime.
+        time.sleep(0.8)
+        self.assertGreater(role._expiration_ns, expiration_ns)
+        self.assertTrue(role.is_holding(0.3))
+        role.release()
+
+    def test_short_playtime_renews_at_a_bounded_rate(self):
+        for playtime_secs in (1, 2):
+            client = StubClient()
+            role = new_role(playtime_secs, client)
+            self.assertTrue(role.take())
+            time.sleep(1)
+            role.release()
+            # About one renewal per half playtime, rather than a busy loop.
+            self.assertLessEqual(client.takes, 4, f"playtime_secs={playtime_secs}")
+
+    def test_release_cancels_renewal(self):
+        client = StubClient()
+        role = new_role(1, client)
+        self.assertTrue(role.take())
+        self.assertTrue(role.release())
+        time.sleep(0.8)
+        self.assertEqual(client.takes, 1)
+        self.assertEqual(client.releases, 1)
+
+    def test_release_during_take_wins(self):
+        client = StubClient(take_delay_secs=0.3)
+        role = new_role(1, client)
+        taken = []
+        taker = threading.Thread(target=lambda: taken.append(role.take()))
+        taker.start()
+        time.sleep(0.1)
+        self.assertTrue(role.release())
+        taker.join()
+        self.assertEqual(taken, [False])
+        time.sleep(0.8)
+        self.assertEqual(client.takes, 1)
+
+    def test_failed_renewal_stops_at_expiration(self):
+        client = StubClient()
+        role = new_role(1, client)
+        self.assertTrue(role.take())
+        client.failing = True
+        time.sleep(1.5)
+        self.assertFalse(role.is_holding())
+        takes = client.takes
+        # The role is not taken back in the background, even once the service would allow it.
+        client.failing = False
+        time.sleep(1)
+        self.assertEqual(client.takes, takes)
+        self.assertFalse(role.is_holding())
+        # Taking the role again resumes the renewals.
+        self.assertTrue(role.take())
+        time.sleep(0.8)
+        self.assertGreater(client.takes, takes + 1)
+        role.release()
+
+if __name__ == "__main__":
+    unittest.main()